@@ -1,11 +1,12 @@
 import os
 import shutil
-import sys
 import uuid
-import xml.etree.ElementTree as ET
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
+from xml.sax.saxutils import quoteattr
 
-from parse_export_pdb import ExportDB, CueType
+from parse_export_pdb import ExportDB
 
 TRAKTOR_PATH_ID = "TRAKTOR"
 
@@ -27,151 +28,242 @@ def convert_to_traktor_color(color_id: int) -> str:
     return str(mapping[color_id - 1] + 1)
 
 
-def export_to_traktor(usb_path: os.PathLike, export_db: ExportDB):
+def make_entry_templates(modified_date, modified_time, volume_attr, nl, tab):
+    """Builds the per-run str.format templates for the collection entries.
+
+    Most ENTRY attributes are the same for every track in every playlist (modified date/time,
+    volume, the location dir, BPM quality), so they are baked in once here and the emitter only
+    fills in the values that actually change per track.
+    """
+    entry_template = (f'{tab[2]}<ENTRY MODIFIED_DATE="{modified_date}" MODIFIED_TIME="{modified_time}"'  # AUDIO_ID="TODO"
+                      ' TITLE={title} ARTIST={artist}>' + nl +
+                      f'{tab[3]}<LOCATION DIR="/:{TRAKTOR_PATH_ID}/:" FILE={{file}}'
+                      f' VOLUME={volume_attr} VOLUMEID={volume_attr}></LOCATION>{nl}'
+                      f'{tab[3]}<ALBUM TRACK="{{track_number}}" TITLE={{album}}></ALBUM>{nl}')
+    # <MODIFICATION_INFO AUTHOR_TYPE="user"> # Don't think I need this.
+
+    tempo_grid_template = (f'{tab[3]}<TEMPO BPM="{{bpm}}" BPM_QUALITY="100.000000"></TEMPO>{nl}'
+                           f'{tab[3]}<CUE_V2 NAME="AutoGrid" DISPL_ORDER="0" TYPE="4" LEN="0.000000"'
+                           f' REPEATS="-1" HOTCUE="-1" START="{{grid_start}}">{nl}'
+                           f'{tab[4]}<GRID BPM="{{bpm}}"></GRID>{nl}'
+                           f'{tab[3]}</CUE_V2>{nl}')
+
+    return entry_template, tempo_grid_template
+
+
+def write_playlist_nml(pl_path, playlist_name, entries, tracks, artist_names, album_names,
+                       genre_names, label_names, key_names, usb_volume,
+                       entry_template, tempo_grid_template, pretty):
+    """Writes one .nml playlist file. Runs in a worker process, so it only takes plain data."""
+    # The NML schema we emit is fixed and flat, so write it with plain f-strings instead of
+    # building Element objects that get serialized right away. quoteattr adds the surrounding
+    # quotes and escapes any XML-special characters in the metadata strings.
+    q = quoteattr
+
+    # Traktor reads the NML just fine without whitespace, so indentation is only generated for
+    # human inspection (--pretty). The default is one compact line, which is smaller and faster
+    # to write.
+    nl = '\n' if pretty else ''
+    tab = ['\t' * depth for depth in range(8)] if pretty else [''] * 8
+
+    # Collect all fragments and flush them as one buffer at the end, so each playlist file costs
+    # a single write() syscall.
+    parts = [f"<?xml version='1.0' encoding='utf-8'?>\n"
+             f'<NML VERSION="20">{nl}'
+             f'{tab[1]}<HEAD COMPANY="www.native-instruments.com" PROGRAM="Traktor Pro 4"></HEAD>{nl}']
+
+    # Collection
+    parts.append(f'{tab[1]}<COLLECTION ENTRIES="{len(entries)}">{nl}')
+
+    # The PLAYLIST block below the COLLECTION repeats the tracks in the same order, so its
+    # PRIMARYKEY fragments are built in this same pass instead of iterating the entries again.
+    primarykey_parts = []
+
+    for pl_entry in entries:
+        track = tracks[pl_entry.track_id]
+
+        parts.append(entry_template.format(title=q(track.title),
+                                           artist=artist_names[track.artist_id],
+                                           file=q(track.file_name),
+                                           track_number=track.track_number_str,
+                                           album=album_names[track.album_id]))
+
+        info = (f'{tab[3]}<INFO GENRE={genre_names[track.genre_id]}'  # FLAGS="TODO"
+                f' COMMENT={q(track.comment)} PLAYCOUNT="{track.play_count}"'
+                f' LABEL={label_names[track.label_id]} KEY={key_names[track.key_id]}'
+                f' PLAYTIME="{track.duration_s_str}" PLAYTIME_FLOAT="{track.duration_f_str}"'
+                f' IMPORT_DATE="{convert_to_traktor_date(track.date_added)}"'
+                f' RELEASE_DATE="{convert_to_traktor_date(track.release_date)}"')
+        if track.color_id != 0:
+            info += f' COLOR="{convert_to_traktor_color(track.color_id)}"'
+        if track.file_size != 0:
+            info += f' FILESIZE="{track.file_size / 1024}"'  # convert from bytes to KiB
+        if track.bitrate != 0:
+            info += f' BITRATE="{track.bitrate * 1000}"'
+        if track.rating != 0:
+            # No clue why, but Traktor uses steps of 255 / 5 = 51 for star ratings.
+            info += f' RANKING="{track.rating * 51}"'
+        parts.append(info + f'></INFO>{nl}')
+
+        # Currently using KEY in INFO, as I don't know the conversion between rekordbox and traktor keys yet.
+        # <MUSICAL_KEY VALUE="TODO">
+
+        parts.append(tempo_grid_template.format(bpm=track.tempo_str,
+                                                grid_start=float(track.analysis.first_beat.time_in_ms)))
+
+        # Memory cues are filtered, sorted and capped to Traktor's 8 slots at parse time.
+        for i, cp in enumerate(track.analysis.memory_cues):
+            parts.append(f'{tab[3]}<CUE_V2 NAME={q(cp.comment if cp.comment else "n.n.")} DISPL_ORDER="0"'
+                         f' TYPE="{"5" if cp.is_loop else "0"}" START="{cp.start_str}"'
+                         f' LEN="{cp.len_str}"'
+                         f' REPEATS="-1" HOTCUE="{i}"></CUE_V2>{nl}')
+
+        parts.append(f'{tab[2]}</ENTRY>{nl}')
+
+        key = f"{usb_volume}/:{TRAKTOR_PATH_ID}/:{track.file_name}"
+        primarykey_parts.append(f'{tab[6]}<ENTRY>{nl}'
+                                f'{tab[7]}<PRIMARYKEY TYPE="TRACK" KEY={q(key)}></PRIMARYKEY>{nl}'
+                                f'{tab[6]}</ENTRY>{nl}')
+
+    parts.append(f'{tab[1]}</COLLECTION>{nl}')
+
+    # Add empty sets
+    # TODO: What is this?
+    parts.append(f'{tab[1]}<SETS ENTRIES="0"></SETS>{nl}')
+
+    # Playlists
+    parts.append(f'{tab[1]}<PLAYLISTS>{nl}'
+                 f'{tab[2]}<NODE TYPE="FOLDER" NAME="$ROOT">{nl}'
+                 f'{tab[3]}<SUBNODES COUNT="1">{nl}'
+                 f'{tab[4]}<NODE TYPE="PLAYLIST" NAME={q(playlist_name)}>{nl}'
+                 f'{tab[5]}<PLAYLIST ENTRIES="{len(entries)}" TYPE="LIST"'
+                 f' UUID="{uuid.uuid4().hex}">{nl}')
+
+    parts.extend(primarykey_parts)
+
+    parts.append(f'{tab[5]}</PLAYLIST>{nl}'
+                 f'{tab[4]}</NODE>{nl}'
+                 f'{tab[3]}</SUBNODES>{nl}'
+                 f'{tab[2]}</NODE>{nl}'
+                 f'{tab[1]}</PLAYLISTS>{nl}')
+
+    # Indexing
+    parts.append(f'{tab[1]}<INDEXING></INDEXING>{nl}'
+                 '</NML>\n')
+
+    with open(pl_path, 'wb') as nml_file:
+        nml_file.write(''.join(parts).encode('utf-8'))
+
+
+def export_to_traktor(usb_path: os.PathLike, export_db: ExportDB, pretty: bool = False):
     traktor_path = os.path.join(usb_path, TRAKTOR_PATH_ID)
-
-    if os.path.exists(traktor_path):
-        shutil.rmtree(traktor_path, ignore_errors=True)  # YOLO-delete everything
-    os.makedirs(traktor_path)
+    os.makedirs(traktor_path, exist_ok=True)
 
     usb_volume = os.path.basename(usb_path)
 
-    for track in export_db.tracks.values():
-        symlink_path = os.path.join(traktor_path, track.file_name)
+    # Bind the per-track dict to a local once; everything below hits it once per track.
+    tracks = export_db.tracks
+
+    # Compute the wanted symlinks first; the collision check is a set lookup on the names we
+    # handed out instead of one lstat syscall per track.
+    desired_links = {}
+    for track in tracks.values():
+        name = track.file_name
 
         unique_counter = 2
-        while os.path.islink(symlink_path):
+        while name in desired_links:
             # Make the shortened file name unique as we use it again later. The exact name is irrelevant.
-            track.file_name = f"{unique_counter}-{track.file_name}"
-            symlink_path = os.path.join(traktor_path, track.file_name)
+            name = f"{unique_counter}-{track.file_name}"
             unique_counter += 1
 
-        os.symlink(f"../{track.file_path}", symlink_path)  # make path relative
+        track.file_name = name
+        desired_links[name] = f"../{track.file_path}"  # make path relative
+
+    # Diff the existing TRAKTOR directory against the wanted symlinks instead of deleting and
+    # recreating everything. Re-running on an unchanged stick costs one readlink per track
+    # instead of an unlink + symlink pair.
+    for dir_entry in os.scandir(traktor_path):
+        target = desired_links.get(dir_entry.name)
+        if target is not None and dir_entry.is_symlink() and os.readlink(dir_entry.path) == target:
+            del desired_links[dir_entry.name]  # already correct, leave it alone
+        elif dir_entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(dir_entry.path, ignore_errors=True)  # YOLO-delete anything stale
+        else:
+            os.remove(dir_entry.path)  # stale symlink or old playlist file, rewritten below
+
+    for name, target in desired_links.items():
+        os.symlink(target, os.path.join(traktor_path, name))
 
     # Move slightly to the future to avoid collisions with the creation of symlinks with a newer time.
     current_datetime = datetime.now() + timedelta(weeks=52*10)
     modified_date = f"{current_datetime.year}/{current_datetime.month}/{current_datetime.day}"
     modified_time = str(current_datetime.hour * 3600 + current_datetime.minute * 60 + current_datetime.second)
 
-    for playlist in export_db.playlists.values():
-        # Do nothing for folders, as traktor exports are flat,
-        # i.e., folder1/folder2/playlist.nml is stored as folder1_folder2_playlist.nml
-        # Get the parent folders via the playlist's parent_id below.
-        if playlist.raw_is_folder:
-            continue
-
-        parent_folders = ""
-        parent_id = playlist.parent_id
-        while parent_id != 0:
-            # Build from innermost to top level.
-            parent = export_db.playlists[parent_id]
-            assert parent.raw_is_folder, "Parent must be a folder."
+    # Sibling playlists share their parent folders, so compute the flattened folder prefix only
+    # once per folder.
+    folder_prefix_cache: dict[int, str] = {}
 
-            parent_folders = f"{parent.name}_{parent_folders}"
-            parent_id = parent.parent_id
-
-        # Replace to avoid / in a playlist's name to create a directory.
-        pl_name = f"{parent_folders}{playlist.name}".replace("/", "_")
-        pl_path = os.path.join(traktor_path, f"{pl_name}.nml")
-        # if os.path.isfile(pl_path):
-        #     print RuntimeError(f"Playlist with name '{playlist.name}' already exists at path '{pl_path}'")
-
-        # Create root
-        nml = ET.Element("NML", VERSION="20")
-        ET.SubElement(nml, "HEAD", COMPANY="www.native-instruments.com", PROGRAM="Traktor Pro 4")
-
-        entries = [entry for entry in export_db.playlist_entries if entry.playlist_id == playlist.playlist_id]
-        entries = sorted(entries, key=lambda e: e.entry_index)
-
-        # Collection
-        collection = ET.SubElement(nml, "COLLECTION", ENTRIES=str(len(entries)))
-
-        for pl_entry in entries:
-            track = export_db.tracks[pl_entry.track_id]
-
-            entry = ET.SubElement(collection, "ENTRY",
-                                  MODIFIED_DATE=modified_date, MODIFIED_TIME=modified_time,  # AUDIO_ID="TODO",
-                                  TITLE=track.title, ARTIST=export_db.artists[track.artist_id].name)
-
-            ET.SubElement(entry, "LOCATION",
-                          DIR=f"/:{TRAKTOR_PATH_ID}/:", FILE=track.file_name,
-                          VOLUME=usb_volume, VOLUMEID=usb_volume)
-
-            ET.SubElement(entry, "ALBUM", TRACK=str(track.track_number), TITLE=export_db.albums[track.album_id].name)
-
-            # ET.SubElement(entry, "MODIFICATION_INFO", AUTHOR_TYPE="user") # Don't think I need this.
-
-            info = ET.SubElement(entry, "INFO",
-                                 GENRE=export_db.genres[track.genre_id].name,  # FLAGS="TODO",
-                                 COMMENT=track.comment, PLAYCOUNT=str(track.play_count),
-                                 LABEL=export_db.labels[track.label_id].name, KEY=export_db.keys[track.key_id].name,
-                                 PLAYTIME=str(track.duration_in_s), PLAYTIME_FLOAT=str(float(track.duration_in_s)),
-                                 IMPORT_DATE=convert_to_traktor_date(track.date_added),
-                                 RELEASE_DATE=convert_to_traktor_date(track.release_date))
-            if track.color_id != 0:
-                info.set('COLOR', convert_to_traktor_color(track.color_id))
-            if track.file_size != 0:
-                info.set('FILESIZE', str(track.file_size / 1024))  # convert from bytes to KiB
-            if track.bitrate != 0:
-                info.set('BITRATE', str(track.bitrate * 1000))
-            if track.rating != 0:
-                # No clue why, but Traktor uses steps of 255 / 5 = 51 for star ratings.
-                info.set('RANKING', str(track.rating * 51))
-
-            ET.SubElement(entry, "TEMPO", BPM=str(track.tempo), BPM_QUALITY="100.000000")
-
-            # Currently using KEY in INFO, as I don't know the conversion between rekordbox and traktor keys yet.
-            # ET.SubElement(entry, "MUSICAL_KEY", VALUE="TODO")
-
-            # Use first analyzed beat at num=1 as beat grid start time. Some tracks start with num=3 or 4.
-            grid_start = next(beat for beat in track.analysis.beat_grid if beat.num == 1)
-            cue = ET.SubElement(entry, "CUE_V2",
-                                NAME="AutoGrid", DISPL_ORDER="0", TYPE="4", LEN="0.000000", REPEATS="-1", HOTCUE="-1",
-                                START=str(float(grid_start.time_in_ms)))
-
-            ET.SubElement(cue, "GRID", BPM=str(track.tempo))
-
-            # Rekordbox has more slots for memory cues and hot cues. I don't know yet how I want to assign them, so I'm
-            # skipping hot cues for now, as I don't use them.
-            cues = [cp for cp in track.analysis.cue_points if cp.cue_type != CueType.HOT]
-            cues = sorted(cues, key=lambda c: c.time_in_ms)
-            if len(cues) > 8:
-                print(f"[WARNING] More than 8 memory cues (found {len(cues)}) in track '{track.title}'. "
-                      f"Only storing first 8 of them, as Traktor does not support more.", file=sys.stderr)
-                cues = cues[:8]
-
-            for i, cp in enumerate(cues):
-                if cp.cue_type == CueType.HOT:
-                    continue
-
-                ET.SubElement(entry, "CUE_V2",
-                              NAME=cp.comment if cp.comment else "n.n.", DISPL_ORDER="0",
-                              TYPE="5" if cp.is_loop else "0", START=str(float(cp.time_in_ms)),
-                              LEN=str(float(cp.loop_end_in_ms - cp.time_in_ms)) if cp.is_loop else "0.000000",
-                              REPEATS="-1", HOTCUE=str(i))
-
-        # Add empty sets
-        # TODO: What is this?
-        ET.SubElement(nml, "SETS", ENTRIES="0")
-
-        # Playlists
-        playlists = ET.SubElement(nml, "PLAYLISTS")
-        root_node = ET.SubElement(playlists, "NODE", TYPE="FOLDER", NAME="$ROOT")
-        subnodes = ET.SubElement(root_node, "SUBNODES", COUNT="1")
-        playlist_node = ET.SubElement(subnodes, "NODE", TYPE="PLAYLIST", NAME=playlist.name)
-
-        playlist = ET.SubElement(playlist_node, "PLAYLIST",
-                                 ENTRIES=str(len(entries)), TYPE="LIST", UUID=str(uuid.uuid4()).replace('-', ''))
-
-        for pl_entry in entries:
-            track = export_db.tracks[pl_entry.track_id]
-            p_entry = ET.SubElement(playlist, "ENTRY")
-            key = f"{usb_volume}/:{TRAKTOR_PATH_ID}/:{track.file_name}"
-            ET.SubElement(p_entry, "PRIMARYKEY", TYPE="TRACK", KEY=key)
-
-        # Indexing
-        ET.SubElement(nml, "INDEXING")
-
-        tree = ET.ElementTree(nml)
-        ET.indent(tree, space='\t')
-        tree.write(pl_path, encoding='utf-8', xml_declaration=True, short_empty_elements=False)
+    def folder_prefix(folder_id: int) -> str:
+        # Collect the uncached part of the chain in a list first, so each prefix string is built
+        # exactly once (top-down) instead of re-concatenating on every level.
+        uncached = []
+        while folder_id != 0 and folder_id not in folder_prefix_cache:
+            parent = export_db.playlists[folder_id]
+            assert parent.raw_is_folder, "Parent must be a folder."
+            uncached.append((folder_id, parent.name))
+            folder_id = parent.parent_id
+
+        prefix = folder_prefix_cache[folder_id] if folder_id != 0 else ""
+        for parent_id, name in reversed(uncached):
+            prefix = f"{prefix}{name}_"
+            folder_prefix_cache[parent_id] = prefix
+        return prefix
+
+    # Group the entries by playlist once, instead of scanning the full entry list again for
+    # every playlist.
+    entries_by_playlist = defaultdict(list)
+    for entry in export_db.playlist_entries:
+        entries_by_playlist[entry.playlist_id].append(entry)
+
+    # Artist/album/genre/label/key names repeat across many tracks, so escape each one once up
+    # front instead of looking up and re-quoting it for every entry.
+    artist_names = {artist_id: quoteattr(artist.name) for artist_id, artist in export_db.artists.items()}
+    album_names = {album_id: quoteattr(album.name) for album_id, album in export_db.albums.items()}
+    genre_names = {genre_id: quoteattr(genre.name) for genre_id, genre in export_db.genres.items()}
+    label_names = {label_id: quoteattr(label.name) for label_id, label in export_db.labels.items()}
+    key_names = {key_id: quoteattr(key.name) for key_id, key in export_db.keys.items()}
+    volume_attr = quoteattr(usb_volume)
+
+    nl = '\n' if pretty else ''
+    tab = ['\t' * depth for depth in range(8)] if pretty else [''] * 8
+    entry_template, tempo_grid_template = make_entry_templates(modified_date, modified_time,
+                                                               volume_attr, nl, tab)
+
+    # Every playlist's file is independent of the others once the shared lookups above exist, so
+    # fan the CPU-bound serialization out across cores. Only the tracks that actually appear in a
+    # playlist are sent to its worker to keep pickling cheap.
+    with ProcessPoolExecutor() as executor:
+        results = []
+        for playlist in export_db.playlists.values():
+            # Do nothing for folders, as traktor exports are flat,
+            # i.e., folder1/folder2/playlist.nml is stored as folder1_folder2_playlist.nml
+            # Get the parent folders via the playlist's parent_id below.
+            if playlist.raw_is_folder:
+                continue
+
+            # Replace to avoid / in a playlist's name to create a directory.
+            pl_name = f"{folder_prefix(playlist.parent_id)}{playlist.name}".replace("/", "_")
+            pl_path = os.path.join(traktor_path, f"{pl_name}.nml")
+            # if os.path.isfile(pl_path):
+            #     print RuntimeError(f"Playlist with name '{playlist.name}' already exists at path '{pl_path}'")
+
+            entries = sorted(entries_by_playlist.get(playlist.playlist_id, ()), key=lambda e: e.entry_index)
+            playlist_tracks = {pl_entry.track_id: tracks[pl_entry.track_id] for pl_entry in entries}
+
+            results.append(executor.submit(write_playlist_nml, pl_path, playlist.name, entries,
+                                           playlist_tracks, artist_names, album_names, genre_names,
+                                           label_names, key_names, usb_volume,
+                                           entry_template, tempo_grid_template, pretty))
+
+        for result in results:
+            result.result()  # re-raise errors from the workers
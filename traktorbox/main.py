@@ -1,4 +1,5 @@
 import argparse
+import logging
 
 from parse_export_pdb import parse_export_pdb
 from export_to_traktor import export_to_traktor
@@ -10,8 +11,15 @@ if __name__ == '__main__':
         description='Convert exported rekordbox playlists to Traktor.')
 
     parser.add_argument('usb_path', help="Path to USB stick containing exported rekordbox playlists.")
+    parser.add_argument('--pretty', action='store_true',
+                        help="Indent the generated .nml files for easier manual inspection. "
+                             "Traktor does not need this and it slows down the export.")
+    parser.add_argument('--verbose', action='store_true',
+                        help="Log every parsed track, playlist, cue point, etc. to the console. "
+                             "Mainly for debugging, and slow for big libraries.")
 
     args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.WARNING, format='%(message)s')
     usb_path = args.usb_path
     if not os.path.isdir(usb_path):
         raise FileNotFoundError(f"Path to USB stick does not exists: {usb_path}")
@@ -24,4 +32,4 @@ if __name__ == '__main__':
         data = f.read()
 
     export_db = parse_export_pdb(usb_path, data)
-    export_to_traktor(usb_path, export_db)
+    export_to_traktor(usb_path, export_db, pretty=args.pretty)
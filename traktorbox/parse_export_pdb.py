@@ -1,29 +1,61 @@
+import codecs
+import logging
+import mmap
 import os
 import struct
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from enum import Enum
-from pathlib import Path
 
-
-def utf16_be_str_from_bytes(data, offset) -> str:
-    return str(data[offset])
+log = logging.getLogger(__name__)
+
+
+# All struct formats are compiled once at import time. struct.unpack() re-parses the format
+# string on every call, which adds up over the millions of rows and strings in a big library,
+# and unpack_from() reads in place instead of allocating a temporary slice per call.
+_U16 = struct.Struct('<H')
+_U32 = struct.Struct('<I')
+_ALBUM = struct.Struct('<HHIIIIBB')
+_ARTIST = struct.Struct('<HHIBBH')
+_TRACK = struct.Struct('<HHIIIIIHHIIIIIIIIIIIIHHHHHHBBHH21H')  # fixed fields + 21 string offsets
+_PLAYLIST = struct.Struct('<IIIII')
+_PLAYLIST_ENTRY = struct.Struct('<III')
+_PDB_HDR = struct.Struct('<IIIIIII')
+_TABLE_PTR = struct.Struct('<IIII')
+_PAGE_HDR = struct.Struct('<IIIIIIBBBBHHHHHH')
+_ROW_OFFS = struct.Struct('<18H')
+
+# The analysis files are big-endian.
+_ANLZ_SECTION = struct.Struct('>4sII')
+_BEAT_GRID_HDR = struct.Struct('>III')
+_CUE_LIST_HDR = struct.Struct('>IHH')
+_BEAT = struct.Struct('>HHI')
+_CUE = struct.Struct('>4sIIIBBHIIBBHIHHI')
+
+# Bound decode functions, resolved once. str(buf, encoding) goes through the codec registry on
+# every call; these call straight into the codec and accept memoryviews.
+_DECODE_ASCII = codecs.lookup('ascii').decode
+_DECODE_UTF8 = codecs.lookup('utf-8').decode
+_DECODE_UTF16 = codecs.lookup('utf-16').decode
+_DECODE_UTF16_BE = codecs.lookup('utf-16-be').decode
 
 
 def string_from_bytes(data, offset) -> str:
-    meta = struct.unpack('B', data[offset:offset + 1])[0]
+    meta = data[offset]  # indexing a bytes object yields the int directly
 
     is_short = meta & (1 << 0)
     if is_short:
         str_len = meta >> 1
-        return str(data[offset + 1:offset + str_len], 'ascii')
+        return _DECODE_ASCII(data[offset + 1:offset + str_len])[0]
 
     is_utf16 = meta & (1 << 4)
     is_utf8 = meta & (1 << 5)
     # is_ascii = meta & (1 << 6)
     # is_little_endian = meta & (1 << 7)
 
-    str_len = struct.unpack('H', data[offset + 1:offset + 3])[0]
-    return str(data[offset + 4:offset + str_len], 'utf-16' if is_utf16 else 'utf-8' if is_utf8 else 'ascii')
+    str_len = int.from_bytes(data[offset + 1:offset + 3], 'little')
+    decode = _DECODE_UTF16 if is_utf16 else _DECODE_UTF8 if is_utf8 else _DECODE_ASCII
+    return decode(data[offset + 4:offset + str_len])[0]
 
 
 class TableType(Enum):
@@ -64,7 +96,7 @@ class Album:
     @staticmethod
     def from_bytes(page_data, row_offset):
         a = Album()
-        raw_album = struct.unpack('HHIIIIBB', page_data[row_offset:row_offset + Album.NUM_BYTES_HEADER])
+        raw_album = _ALBUM.unpack_from(page_data, row_offset)
         _, _, _, a.artist_id, a.album_id, _, _, name_offset = raw_album
         a.name = string_from_bytes(page_data, row_offset + name_offset)
         return a
@@ -84,7 +116,7 @@ class Artist:
     def from_bytes(page_data, row_offset):
         a = Artist()
 
-        raw_artist = struct.unpack('HHIBBH', page_data[row_offset:row_offset + Artist.NUM_BYTES_HEADER])
+        raw_artist = _ARTIST.unpack_from(page_data, row_offset)
         subtype, _, a.artist_id, _, name_offset_short, name_offset_long = raw_artist
 
         if subtype == 0x60:
@@ -102,7 +134,7 @@ class Artwork:
 
     @staticmethod
     def from_bytes(page_data, row_offset):
-        return Artwork(struct.unpack('I', page_data[row_offset:row_offset + 4])[0],
+        return Artwork(_U32.unpack_from(page_data, row_offset)[0],
                        string_from_bytes(page_data, row_offset + 4))
 
 
@@ -117,7 +149,7 @@ class Color:
 
     @staticmethod
     def from_bytes(page_data, row_offset):
-        return Color(struct.unpack('H', page_data[row_offset + 4:row_offset + 6])[0],
+        return Color(_U16.unpack_from(page_data, row_offset + 4)[0],
                      string_from_bytes(page_data, row_offset + Color.NUM_BYTES_HEADER))
 
 
@@ -128,7 +160,7 @@ class Genre:
 
     @staticmethod
     def from_bytes(page_data, row_offset):
-        return Genre(struct.unpack('I', page_data[row_offset:row_offset + 4])[0],
+        return Genre(_U32.unpack_from(page_data, row_offset)[0],
                      string_from_bytes(page_data, row_offset + 4))
 
 
@@ -139,7 +171,7 @@ class Key:
 
     @staticmethod
     def from_bytes(page_data, row_offset):
-        return Key(struct.unpack('I', page_data[row_offset:row_offset + 4])[0],
+        return Key(_U32.unpack_from(page_data, row_offset)[0],
                    string_from_bytes(page_data, row_offset + 8))
 
 
@@ -150,11 +182,11 @@ class Label:
 
     @staticmethod
     def from_bytes(page_data, row_offset):
-        return Label(struct.unpack('I', page_data[row_offset:row_offset + 4])[0],
+        return Label(_U32.unpack_from(page_data, row_offset)[0],
                      string_from_bytes(page_data, row_offset + 4))
 
 
-@dataclass
+@dataclass(slots=True)
 class Beat:
     num: int
     tempo: float
@@ -162,19 +194,17 @@ class Beat:
 
     NUM_BYTES_HEADER = 8
 
-    @staticmethod
-    def from_bytes(page_data, row_offset):
-        b = Beat(*struct.unpack('>HHI', page_data[row_offset:row_offset + Beat.NUM_BYTES_HEADER]))
-        b.tempo = b.tempo / 100
-        return b
-
 
 class CueType(Enum):
     MEMORY = 0
     HOT = 1
 
 
-@dataclass
+# Indexed by `hot_cue != 0`, so the cue loop picks the type without a branch.
+_CUE_TYPES = (CueType.MEMORY, CueType.HOT)
+
+
+@dataclass(slots=True)
 class Cue:
     cue_type: CueType
     hot_cue: int
@@ -191,35 +221,47 @@ class Cue:
     serialized_size: int
 
     comment: str = ""
+    # Pre-formatted for the Traktor export, so it doesn't re-run the conversion for every
+    # playlist a track appears in.
+    start_str: str = ""
+    len_str: str = ""
 
     NUM_BYTES_HEADER = 44
 
     def __init__(self):
-        pass
+        # With slots there are no class-level defaults, so seed the fields that from_bytes only
+        # sets conditionally.
+        self.comment = ""
+        self.hot_cue_color_id = 0
+        self.hot_cue_rgb = (0, 0, 0)
 
     @staticmethod
     def from_bytes(data, row_offset):
         c = Cue()
 
-        raw_cue = struct.unpack('>4sIIIBBHIIBBHIHHI', data[row_offset:row_offset + Cue.NUM_BYTES_HEADER])
+        raw_cue = _CUE.unpack_from(data, row_offset)
         (code, len_header, len_entry, c.hot_cue, simple_type, _, _, c.time_in_ms, c.loop_end_in_ms, c.color_id, _, _, _,
          loop_numerator, loop_denominator, len_comment) = raw_cue
         assert code == b'PCP2', f"Unexpected magic bytes in Cue: {code}"
 
-        c.cue_type = CueType.MEMORY if c.hot_cue == 0 else CueType.HOT
+        c.cue_type = _CUE_TYPES[c.hot_cue != 0]
         c.is_simple = simple_type == 1
         c.is_loop = simple_type == 2
         c.loop_size_quantized = (loop_numerator, loop_denominator)
+        c.start_str = str(float(c.time_in_ms))
+        c.len_str = str(float(c.loop_end_in_ms - c.time_in_ms)) if c.is_loop else "0.000000"
 
-        if len_entry > Cue.NUM_BYTES_HEADER:
+        num_bytes_header = Cue.NUM_BYTES_HEADER
+        if len_entry > num_bytes_header:
             if len_comment > 0:
-                str_pos = row_offset + Cue.NUM_BYTES_HEADER
-                c.comment = str(data[str_pos:str_pos + len_comment - 2], 'utf-16be')  # -2 for NUL terminator
+                str_pos = row_offset + num_bytes_header
+                c.comment = _DECODE_UTF16_BE(data[str_pos:str_pos + len_comment - 2])[0]  # -2 for NUL terminator
 
-        if len_entry > Cue.NUM_BYTES_HEADER + len_comment:
-            cue_rgb_offset = row_offset + Cue.NUM_BYTES_HEADER + len_comment
-            c.hot_cue_color_id, r, g, b = struct.unpack('BBBB', data[cue_rgb_offset:cue_rgb_offset + 4])
-            c.hot_cue_rgb = (r, g, b)
+        if len_entry > num_bytes_header + len_comment:
+            # Four single bytes; indexing reads them directly without an unpack call.
+            cue_rgb_offset = row_offset + num_bytes_header + len_comment
+            c.hot_cue_color_id = data[cue_rgb_offset]
+            c.hot_cue_rgb = (data[cue_rgb_offset + 1], data[cue_rgb_offset + 2], data[cue_rgb_offset + 3])
 
         c.serialized_size = len_entry
         return c
@@ -229,14 +271,21 @@ class Cue:
 class Analysis:
     beat_grid: list[Beat]
     cue_points: list[Cue]
+    first_beat: Beat
+    memory_cues: list[Cue]
 
     def __init__(self):
         self.beat_grid = []
         self.cue_points = []
+        self.first_beat = None
+        self.memory_cues = []
 
 
-@dataclass
+# slots=True drops the per-instance __dict__; with 30+ attributes per track this is the
+# biggest single allocation saving in the parser.
+@dataclass(slots=True)
 class Track:
+    i_shift: int
     bitmask: int
     sample_rate: int
     composer_id: int
@@ -263,6 +312,12 @@ class Track:
 
     analysis: Analysis
 
+    # Pre-formatted attribute values for the Traktor export (see Cue above).
+    tempo_str: str = ""
+    track_number_str: str = ""
+    duration_s_str: str = ""
+    duration_f_str: str = ""
+
     date_added: str = ""
     release_date: str = ""
     mix_name: str = ""
@@ -277,44 +332,36 @@ class Track:
     NUM_BYTES_TRACK_ROW_STRING_OFFSETS = 42
     NUM_BYTES_HEADER = NUM_BYTES_BASE_TRACK_ROW + NUM_BYTES_TRACK_ROW_STRING_OFFSETS
 
+    # The attribute stored at each of the 21 string offsets; None for the ones we don't use,
+    # whose strings are then never decoded at all.
+    STR_FIELDS = (None, None, None, None, None, None, None, None, None, None,
+                  'date_added', 'release_date', 'mix_name', None, 'analyze_path', 'analyze_date',
+                  'comment', 'title', None, 'file_name', 'file_path')
+
     def __init__(self):
         self.analysis = Analysis()
 
     @staticmethod
     def from_bytes(page_data, row_offset):
-        header = page_data[row_offset:row_offset + Track.NUM_BYTES_HEADER]
-        raw_track = struct.unpack('HHIIIIIHHIIIIIIIIIIIIHHHHHHBBHH', header[:Track.NUM_BYTES_BASE_TRACK_ROW])
-        string_offsets = struct.unpack('H' * 21, header[Track.NUM_BYTES_BASE_TRACK_ROW:])
+        raw_track = _TRACK.unpack_from(page_data, row_offset)
 
         t = Track()
         (_, t.i_shift, t.bitmask, t.sample_rate, t.composer_id, t.file_size, _, _, _, t.artwork_id, t.key_id,
          t.orig_artist_id, t.label_id, t.remixer_id, t.bitrate, t.track_number, tempo, t.genre_id, t.album_id,
          t.artist_id, t.track_id, t.disc_number, t.play_count, t.year, t.sample_depth, t.duration_in_s, _, t.color_id,
-         t.rating, _, _) = raw_track
+         t.rating, _, _, *string_offsets) = raw_track
 
         # Tempo is stored *100 for higher precision.
         t.tempo = tempo / 100
 
-        for i, offset in enumerate(string_offsets[1:], 1):
-            str_data = string_from_bytes(page_data, row_offset + offset)
-            if i == 10:
-                t.date_added = str_data
-            elif i == 11:
-                t.release_date = str_data
-            elif i == 12:
-                t.mix_name = str_data
-            elif i == 14:
-                t.analyze_path = str_data
-            elif i == 15:
-                t.analyze_date = str_data
-            elif i == 16:
-                t.comment = str_data
-            elif i == 17:
-                t.title = str_data
-            elif i == 19:
-                t.file_name = str_data
-            elif i == 20:
-                t.file_path = str_data
+        t.tempo_str = str(t.tempo)
+        t.track_number_str = str(t.track_number)
+        t.duration_s_str = str(t.duration_in_s)
+        t.duration_f_str = str(float(t.duration_in_s))
+
+        for field, offset in zip(Track.STR_FIELDS, string_offsets):
+            if field is not None:
+                setattr(t, field, string_from_bytes(page_data, row_offset + offset))
 
         return t
 
@@ -334,9 +381,8 @@ class Playlist:
 
     @staticmethod
     def from_bytes(page_data, row_offset):
-        header = page_data[row_offset:row_offset + Playlist.NUM_BYTES_HEADER]
         p = Playlist()
-        p.parent_id, _, p.sort_order, p.playlist_id, p.raw_is_folder = struct.unpack('IIIII', header)
+        p.parent_id, _, p.sort_order, p.playlist_id, p.raw_is_folder = _PLAYLIST.unpack_from(page_data, row_offset)
         p.name = string_from_bytes(page_data, row_offset + Playlist.NUM_BYTES_HEADER)
         return p
 
@@ -351,8 +397,7 @@ class PlaylistEntry:
 
     @staticmethod
     def from_bytes(page_data, row_offset):
-        header = page_data[row_offset:row_offset + PlaylistEntry.NUM_BYTES_HEADER]
-        return PlaylistEntry(*(struct.unpack('III', header)))
+        return PlaylistEntry(*_PLAYLIST_ENTRY.unpack_from(page_data, row_offset))
 
 
 @dataclass
@@ -394,61 +439,127 @@ def parse_anlz_file(data, track):
     """
     Based on analysis from: https://djl-analysis.deepsymmetry.org/rekordbox-export-analysis/anlz.html
     """
-    num_bytes_anlz_header = 12
-    header = struct.unpack('>4sII', data[:num_bytes_anlz_header])
+    header = _ANLZ_SECTION.unpack_from(data, 0)
     code, len_header, len_file = header
 
     assert code == b'PMAI', f"Unexpected magic bytes in header: {code}"
 
     offset_tagged_section = 28  # start of first tagged section
-    num_bytes_section_header = 12
 
     while offset_tagged_section < len_file:
-        header = struct.unpack('>4sII', data[offset_tagged_section:offset_tagged_section + num_bytes_section_header])
+        header = _ANLZ_SECTION.unpack_from(data, offset_tagged_section)
         section_code, len_header, len_tag = header
-        tag_header_offset = offset_tagged_section + num_bytes_section_header
+        tag_header_offset = offset_tagged_section + _ANLZ_SECTION.size
 
         if section_code == b'PQTZ':
-            beat_grid_header = struct.unpack('>III', data[tag_header_offset:tag_header_offset + 12])
+            beat_grid_header = _BEAT_GRID_HDR.unpack_from(data, tag_header_offset)
             _, _, len_beats = beat_grid_header
             beat_offset = tag_header_offset + 12
-            for i in range(len_beats):
-                beat = Beat.from_bytes(data, beat_offset)
-                # print(beat)  # don't print, too much noise.
-                track.analysis.beat_grid.append(beat)
-                beat_offset += Beat.NUM_BYTES_HEADER
+            # Beats are fixed-size and densely packed, so decode the whole grid with one
+            # iter_unpack instead of a Python-level unpack call per beat.
+            beat_data = data[beat_offset:beat_offset + len_beats * Beat.NUM_BYTES_HEADER]
+            track.analysis.beat_grid.extend(
+                Beat(num, tempo / 100, time_in_ms) for num, tempo, time_in_ms in _BEAT.iter_unpack(beat_data))
 
         elif section_code == b'PCOB':
             pass
 
         elif section_code == b'PCO2':
-            cue_list_header = struct.unpack('>IHH', data[tag_header_offset:tag_header_offset + 8])
+            cue_list_header = _CUE_LIST_HDR.unpack_from(data, tag_header_offset)
             cue_type, len_cues, zeros = cue_list_header
             assert zeros == 0, f"Zero field is not 0. This is unexpected."
 
             cue_offset = tag_header_offset + 8
+            log_rows = log.isEnabledFor(logging.DEBUG)
+            cue_points_append = track.analysis.cue_points.append
+            cue_from_bytes = Cue.from_bytes
             for i in range(len_cues):
-                cue = Cue.from_bytes(data, cue_offset)
-                print(cue)
-                track.analysis.cue_points.append(cue)
+                cue = cue_from_bytes(data, cue_offset)
+                if log_rows:
+                    log.debug("%r", cue)
+                cue_points_append(cue)
                 cue_offset += cue.serialized_size
 
         offset_tagged_section += len_tag
 
 
+def _parse_track_analysis(usb_path, track: Track):
+    # The two analysis files only differ in their extension, so compute the shared prefix once.
+    # os.path.splitext avoids constructing a Path object just for the stem.
+    path_prefix = os.path.splitext(f"{usb_path}/{track.analyze_path}")[0]
+    for file_extension in ('DAT', 'EXT'):
+        # mmap hands the parser a zero-copy buffer backed by the page cache instead of
+        # copying each file into a fresh bytes object first.
+        with open(f"{path_prefix}.{file_extension}", 'rb') as f, \
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, \
+                memoryview(mapped) as data:
+            parse_anlz_file(data, track)
+
+    # The first analyzed beat at num=1 is the beat grid start time in the export. Some tracks
+    # start with num=3 or 4. Resolve it once here, so a missing grid fails at parse time
+    # instead of deep in the serializer.
+    for beat in track.analysis.beat_grid:
+        if beat.num == 1:
+            track.analysis.first_beat = beat
+            break
+    assert track.analysis.first_beat is not None, f"No num=1 beat in beat grid of track '{track.title}'."
+
+    # Rekordbox has more slots for memory cues and hot cues. I don't know yet how I want to
+    # assign them, so I'm skipping hot cues for now, as I don't use them. Filter, sort and cap
+    # once per track here; a track used in several playlists otherwise redoes this per playlist.
+    memory_cues = sorted((cue for cue in track.analysis.cue_points if cue.cue_type != CueType.HOT),
+                         key=lambda c: c.time_in_ms)
+    if len(memory_cues) > 8:
+        log.warning("More than 8 memory cues (found %d) in track '%s'. "
+                    "Only storing first 8 of them, as Traktor does not support more.",
+                    len(memory_cues), track.title)
+        memory_cues = memory_cues[:8]
+    track.analysis.memory_cues = memory_cues
+
+
 def parse_analysis_files(usb_path, export_db: ExportDB):
-    for track in export_db.tracks.values():
-        if not track.analyze_path:
-            continue
+    # Lots of small files, so this phase is dominated by I/O. The GIL is released while reading,
+    # which lets a thread pool overlap the reads with the parsing; every task writes only to its
+    # own track.analysis, so there is no shared state between them.
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = [executor.submit(_parse_track_analysis, usb_path, track)
+                   for track in export_db.tracks.values() if track.analyze_path]
+        for result in results:
+            result.result()
 
-        for file_extension in ('DAT', 'EXT'):
-            anlz_path = f"{usb_path}/{track.analyze_path}"
-            dir_path = os.path.dirname(anlz_path)
-            file_stem = Path(anlz_path).stem
-            with open(f"{dir_path}/{file_stem}.{file_extension}", 'rb') as f:
-                data = f.read()
 
-            parse_anlz_file(data, track)
+def _valid_row_positions(page_data, len_page: int, num_rows: int, num_bytes_table_page: int) -> list[int]:
+    """Decodes the row-offset groups at the back of a page into the positions of the valid rows.
+
+    This is the innermost fixed-layout loop of the parser, so it only touches locals and does
+    nothing but offset arithmetic; the caller handles dispatch and logging per row.
+    """
+    num_bytes_row_offsets = 36
+    positions = []
+    positions_append = positions.append  # bound once, called per valid row
+    unpack_row_offsets = _ROW_OFFS.unpack_from  # bind once, called per 16-row group
+    seen_rows = 0
+    row_group = 0
+    while seen_rows < num_rows:
+        row_offset_pos = len_page - (row_group + 1) * num_bytes_row_offsets
+        raw_row_offsets = unpack_row_offsets(page_data, row_offset_pos)
+        # The group is laid out back-to-front: offsets at indices 15..0, mask at 16.
+        # Slice with a negative step instead of materializing a reversed copy.
+        row_mask = raw_row_offsets[16]
+        for i, row_offset in enumerate(raw_row_offsets[15::-1]):
+            seen_rows += 1
+            if seen_rows > num_rows:
+                break
+
+            # Row not valid anymore
+            if not row_mask >> i & 1:
+                continue
+
+            positions_append(num_bytes_table_page + row_offset)
+
+        row_group += 1
+
+    return positions
 
 
 def parse_export_pdb(usb_path, data) -> ExportDB:
@@ -457,22 +568,22 @@ def parse_export_pdb(usb_path, data) -> ExportDB:
     """
     export_db = ExportDB()
 
+    # A memoryview makes every page_data/row slice below an O(1) view into the file instead of
+    # a copy; str() and int.from_bytes accept the views directly.
+    data = memoryview(data)
+
     # Header
     offset = 0
-    num_bytes_header = 28
-    header = struct.unpack('IIIIIII', data[offset:offset + num_bytes_header])
+    header = _PDB_HDR.unpack_from(data, offset)
     zeros1, len_page, num_tables, next_u, _, sequence, zeros2 = header
     assert zeros1 == zeros2 == 0, "Zero fields are not 0. This is unexpected."
-    offset += num_bytes_header
+    offset += _PDB_HDR.size
 
-    # Table Pointers
+    # Table Pointers. They sit back-to-back after the header, so decode them all with one
+    # iter_unpack instead of an unpack call per table.
     table_pointers: list[TablePointer] = []
-    num_bytes_table_pointer = 16
-    for table_num in range(num_tables):
-        raw_table_pointer = struct.unpack('IIII', data[offset:offset + num_bytes_table_pointer])
-        offset += num_bytes_table_pointer
-
-        table_type, _, first_page, last_page = raw_table_pointer
+    pointer_data = data[offset:offset + num_tables * _TABLE_PTR.size]
+    for table_type, _, first_page, last_page in _TABLE_PTR.iter_unpack(pointer_data):
         table_type = TableType(table_type) if table_type < TableType.UNKNOWN.value else TableType.UNKNOWN
         table_pointers.append(TablePointer(table_type, first_page, last_page))
 
@@ -483,7 +594,7 @@ def parse_export_pdb(usb_path, data) -> ExportDB:
         while True:
             offset = len_page * page_idx
             page_data = data[offset:offset + len_page]
-            raw_table = struct.unpack('IIIIIIBBBBHHHHHH', page_data[:num_bytes_table_page])
+            raw_table = _PAGE_HDR.unpack_from(page_data, 0)
             (zeros, redundant_page_idx, page_type, next_page, _, _, num_rows_s, _, _, _, free_size, used_size, _,
              num_rows_l, _, _) = raw_table
 
@@ -498,31 +609,24 @@ def parse_export_pdb(usb_path, data) -> ExportDB:
             if num_rows_s == 0:
                 num_rows = 0
 
-            pages_per_group = 16
-            seen_rows = 0
-            row_group = 0
-            while seen_rows < num_rows:
-                rows = row_group * pages_per_group
-                num_bytes_row_offsets = 36
-                row_offset_pos = len_page - (rows // pages_per_group * num_bytes_row_offsets) - num_bytes_row_offsets
-                raw_row_offsets = struct.unpack('H' * 18,
-                                                page_data[row_offset_pos:row_offset_pos + num_bytes_row_offsets])
-                reversed_raw_row_offset = list(reversed(raw_row_offsets))
-                row_mask = reversed_raw_row_offset[1]
-                row_offsets = reversed_raw_row_offset[2:]
-                for i, row_offset in enumerate(row_offsets):
-                    seen_rows += 1
-                    if seen_rows > num_rows:
-                        break
-
-                    # Row not valid anymore
-                    if row_mask & (1 << i) == 0:
-                        continue
-
-                    row_pos = num_bytes_table_page + row_offset
-                    parse_entry(export_db, page_data, page_type, row_pos)
-
-                row_group += 1
+            # The handler is constant over a whole page, so resolve the dispatch (and the
+            # logging level) once here instead of per row. Unhandled tables skip their rows.
+            handler = _PAGE_HANDLERS.get(page_type)
+            if handler is None:
+                num_rows = 0
+            log_rows = log.isEnabledFor(logging.DEBUG)
+
+            row_positions = _valid_row_positions(page_data, len_page, num_rows, num_bytes_table_page)
+            if page_type == TableType.PLAYLIST_ENTRIES and not log_rows:
+                # Playlist entries are plain fixed-size records with no strings, so decode and
+                # store a whole page of them with one extend instead of a call per row.
+                export_db.playlist_entries.extend(
+                    PlaylistEntry(*_PLAYLIST_ENTRY.unpack_from(page_data, row_pos)) for row_pos in row_positions)
+            else:
+                for row_pos in row_positions:
+                    entry = handler(export_db, page_data, row_pos)
+                    if log_rows:
+                        log.debug("%r", entry)
 
             # End of page traversal
             if page_idx == table_pointer.last_page:
@@ -535,45 +639,77 @@ def parse_export_pdb(usb_path, data) -> ExportDB:
     return export_db
 
 
-def parse_entry(export_db: ExportDB, page_data, page_type: TableType, row_pos: int) -> None:
-    match page_type:
-        case TableType.ARTISTS:
-            artist = Artist.from_bytes(page_data, row_pos)
-            print(artist)
-            export_db.artists[artist.artist_id] = artist
-        case TableType.ALBUMS:
-            album = Album.from_bytes(page_data, row_pos)
-            print(album)
-            export_db.albums[album.album_id] = album
-        case TableType.ARTWORK:
-            artwork = Artwork.from_bytes(page_data, row_pos)
-            print(artwork)
-            export_db.artwork[artwork.artwork_id] = artwork
-        case TableType.COLORS:
-            color = Color.from_bytes(page_data, row_pos)
-            print(color)
-            export_db.colors[color.color_id] = color
-        case TableType.GENRES:
-            genre = Genre.from_bytes(page_data, row_pos)
-            print(genre)
-            export_db.genres[genre.genre_id] = genre
-        case TableType.KEYS:
-            key = Key.from_bytes(page_data, row_pos)
-            print(key)
-            export_db.keys[key.key_id] = key
-        case TableType.LABELS:
-            label = Label.from_bytes(page_data, row_pos)
-            print(label)
-            export_db.labels[label.label_id] = label
-        case TableType.TRACKS:
-            track = Track.from_bytes(page_data, row_pos)
-            print(track)
-            export_db.tracks[track.track_id] = track
-        case TableType.PLAYLIST_TREE:
-            playlist = Playlist.from_bytes(page_data, row_pos)
-            print(playlist)
-            export_db.playlists[playlist.playlist_id] = playlist
-        case TableType.PLAYLIST_ENTRIES:
-            pl_entry = PlaylistEntry.from_bytes(page_data, row_pos)
-            print(pl_entry)
-            export_db.playlist_entries.append(pl_entry)
\ No newline at end of file
+def _parse_artist(export_db: ExportDB, page_data, row_pos: int):
+    artist = Artist.from_bytes(page_data, row_pos)
+    export_db.artists[artist.artist_id] = artist
+    return artist
+
+
+def _parse_album(export_db: ExportDB, page_data, row_pos: int):
+    album = Album.from_bytes(page_data, row_pos)
+    export_db.albums[album.album_id] = album
+    return album
+
+
+def _parse_artwork(export_db: ExportDB, page_data, row_pos: int):
+    artwork = Artwork.from_bytes(page_data, row_pos)
+    export_db.artwork[artwork.artwork_id] = artwork
+    return artwork
+
+
+def _parse_color(export_db: ExportDB, page_data, row_pos: int):
+    color = Color.from_bytes(page_data, row_pos)
+    export_db.colors[color.color_id] = color
+    return color
+
+
+def _parse_genre(export_db: ExportDB, page_data, row_pos: int):
+    genre = Genre.from_bytes(page_data, row_pos)
+    export_db.genres[genre.genre_id] = genre
+    return genre
+
+
+def _parse_key(export_db: ExportDB, page_data, row_pos: int):
+    key = Key.from_bytes(page_data, row_pos)
+    export_db.keys[key.key_id] = key
+    return key
+
+
+def _parse_label(export_db: ExportDB, page_data, row_pos: int):
+    label = Label.from_bytes(page_data, row_pos)
+    export_db.labels[label.label_id] = label
+    return label
+
+
+def _parse_track(export_db: ExportDB, page_data, row_pos: int):
+    track = Track.from_bytes(page_data, row_pos)
+    export_db.tracks[track.track_id] = track
+    return track
+
+
+def _parse_playlist(export_db: ExportDB, page_data, row_pos: int):
+    playlist = Playlist.from_bytes(page_data, row_pos)
+    export_db.playlists[playlist.playlist_id] = playlist
+    return playlist
+
+
+def _parse_playlist_entry(export_db: ExportDB, page_data, row_pos: int):
+    pl_entry = PlaylistEntry.from_bytes(page_data, row_pos)
+    export_db.playlist_entries.append(pl_entry)
+    return pl_entry
+
+
+# Maps each table we care about to its row handler. Tables without an entry (history, columns,
+# unknown ones) are skipped without touching their rows.
+_PAGE_HANDLERS = {
+    TableType.ARTISTS: _parse_artist,
+    TableType.ALBUMS: _parse_album,
+    TableType.ARTWORK: _parse_artwork,
+    TableType.COLORS: _parse_color,
+    TableType.GENRES: _parse_genre,
+    TableType.KEYS: _parse_key,
+    TableType.LABELS: _parse_label,
+    TableType.TRACKS: _parse_track,
+    TableType.PLAYLIST_TREE: _parse_playlist,
+    TableType.PLAYLIST_ENTRIES: _parse_playlist_entry,
+}